@@ -1,11 +1,17 @@
 import argparse
 import json
+import os
+import sys
 import time
 from tqdm import tqdm
 import google.generativeai as genai
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.structured_output import ResponseStats, gemini_response_schema, parse_labels, reask_prompt
+
 def classify_reports_with_gemini(reports, chat_session, output_file):
     labelled_reports = []
+    stats = ResponseStats()
 
     for report in tqdm(reports, desc="Classifying Reports", unit="report"):
         patient_id = report["patient_id"]
@@ -15,20 +21,21 @@ def classify_reports_with_gemini(reports, chat_session, output_file):
         try:
             time.sleep(1)  # Rate-limiting: adjust as needed.
             response = chat_session.send_message(content)
-            raw_response = response.text.strip("```").strip()
-
-            # Remove any invalid prefix like 'json' and extract JSON object
-            if raw_response.startswith("json"):
-                raw_response = raw_response[len("json"):].strip()
-
-            # Locate the first valid JSON object in the response
-            start_index = raw_response.find("{")
-            end_index = raw_response.rfind("}") + 1
-            if start_index == -1 or end_index == 0:
-                raise ValueError("No JSON object found in the response.")
-
-            cleaned_response = raw_response[start_index:end_index]
-            labels = json.loads(cleaned_response)
+            result = parse_labels(response.text)
+
+            # Ask again only for the findings that could not be recovered
+            reasked = bool(result.missing)
+            if reasked:
+                time.sleep(1)
+                retry = chat_session.send_message(
+                    reask_prompt(result.missing),
+                    generation_config={"response_schema": gemini_response_schema(result.missing)},
+                )
+                result = result.merge(parse_labels(retry.text, findings=result.missing))
+
+            labels = stats.record(result, reasked)
+            if labels is None:
+                raise ValueError(f"Missing labels after re-ask: {', '.join(result.missing)}")
 
             labelled_reports.append({
                 "patient_id": patient_id,
@@ -36,7 +43,7 @@ def classify_reports_with_gemini(reports, chat_session, output_file):
                 "labels": labels
             })
 
-        except (ValueError, json.JSONDecodeError) as e:
+        except ValueError as e:
             print(f"JSON decoding error for report {report_name} of patient {patient_id}: {e}")
         except Exception as e:
             print(f"Error processing report {report_name} for patient {patient_id}: {e}")
@@ -45,6 +52,7 @@ def classify_reports_with_gemini(reports, chat_session, output_file):
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(labelled_reports, f, ensure_ascii=False, indent=4)
 
+    print(stats.summary())
     return labelled_reports
 
 def main():
@@ -72,6 +80,9 @@ def main():
         "top_p": 0.95,
         "top_k": 40,
         "max_output_tokens": 8192,
+        # Constrain the output to the label schema (13 finding keys, Yes/No/Maybe/Undefined values)
+        "response_mime_type": "application/json",
+        "response_schema": gemini_response_schema(),
     }
 
     # Initialize the model
@@ -2,9 +2,17 @@
 
 import json
 import os
+import sys
 import argparse
 from tqdm import tqdm
 import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.structured_output import FINDINGS, ResponseStats, gemini_response_schema, parse_labels, reask_prompt
+from utils.two_stage_prompts import (MENTION_PROMPT, MENTION_VALUES, PRESENCE_PROMPT, PRESENCE_REASK,
+                                     presence_needs_reask, record_presence)
+from labeling.scheduler import is_retryable
+
 # If needed, install the dependencies:
 #   pip install langchain-google-genai
 #   pip install langchain-core
@@ -26,70 +34,54 @@ except ImportError:
 gemini_api_key = ""
 os.environ["GOOGLE_API_KEY"] = gemini_api_key
 
-# Initialize the LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-
-# The 14 key findings we need to analyze
-FINDINGS = [
-    "Atelectasis",
-    "Cardiomegaly",
-    "Consolidation",
-    "Edema",
-    "Enlarged Cardiomediastinum",
-    "Fracture",
-    "Lung Lesion",
-    "Lung Opacity",
-    "Pleural Effusion",
-    "Pleural Other",
-    "Pneumonia",
-    "Pneumothorax",
-    "Support Devices",
-]
-
-def analyze_report(report):
+# Switched off after the first non-transient structured-output failure
+structured_output = True
+
+def ask_mentions(llm, prompt, findings=FINDINGS):
+    """
+    Stage-one request. Asks Gemini for schema-constrained JSON ("True"/"False" per finding) and
+    falls back to a plain request, repaired locally, if structured output fails.
+    Returns the response as JSON text for `parse_labels`.
+    """
+    global structured_output
+    if structured_output:
+        try:
+            structured_llm = llm.with_structured_output(gemini_response_schema(findings, MENTION_VALUES), method="json_mode")
+            response = structured_llm.invoke(prompt)
+            if isinstance(response, dict):
+                return json.dumps(response)
+        except Exception as e:
+            if not is_retryable(e):
+                print(f"Structured output failed ({e}), falling back to local repair for the rest of the run.")
+                structured_output = False
+    return llm([HumanMessage(content=prompt)]).content
+
+def analyze_report(report, llm, mention_stats, presence_stats):
     """
     Analyzes a chest X-ray report and returns a dictionary of refined findings.
     - Keys: the 14 findings (strings).
     - Values: one of "Yes", "No", "Maybe", or "Undefined".
+    Malformed responses are repaired locally and missing findings re-asked; counts go to
+    `mention_stats` (one per report) and `presence_stats` (one per stage-two question).
     Raises an exception if anything goes wrong, so the caller can skip this record.
     """
     # First LLM call: check if each finding is *mentioned* (positively or negatively).
-    first_prompt = f"""Your task is to analyze a chest X-ray report and determine whether each of the following 14 findings is mentioned in the report. A finding is considered “mentioned” if the report explicitly states its presence, absence, or any related term (including synonyms or negative statements such as “no evidence of _____”). For example, a statement like “no pneumothorax” means that “Pneumothorax” is mentioned, so you must return "True" for that key.
-
-When you receive the chest X-ray report, respond only with a single JSON object. That JSON object must contain exactly the 14 keys listed below. Each key must have either the string "True" or "False" as its value:
-
-{{
-"Atelectasis": "...",
-"Cardiomegaly": "...",
-"Consolidation": "...",
-"Edema": "...",
-"Enlarged Cardiomediastinum": "...",
-"Fracture": "...",
-"Lung Lesion": "...",
-"Lung Opacity": "...",
-"Pleural Effusion": "...",
-"Pleural Other": "...",
-"Pneumonia": "...",
-"Pneumothorax": "...",
-"Support Devices": "..."
-}}
-
-Where each ... is replaced by "True" if the finding is mentioned (positively or negatively) or "False" if it is not mentioned at all in the report.
-
-Report: "{report}"
-"""
-    response = llm([HumanMessage(content=first_prompt)])
-    
-    # Parse the JSON from the LLM response
-    content = response.content.strip()
-    # Remove fenced code blocks, if present
-    if content.startswith("```"):
-        content = content.split("\n", 1)[1].rsplit("\n", 1)[0]
-    # Remove language spec if the response starts with "json" or similar
-    if content.lower().startswith("json"):
-        content = content.split("\n", 1)[1]
-    
-    mentioned_findings = json.loads(content)
+    first_prompt = MENTION_PROMPT.format(report=report)
+    response = ask_mentions(llm, first_prompt)
+
+    # Parse (and if necessary repair) the JSON from the LLM response
+    result = parse_labels(response, values=MENTION_VALUES)
+
+    # Ask again only for the findings that could not be recovered
+    reasked = bool(result.missing)
+    if reasked:
+        time.sleep(3.0)
+        retry = ask_mentions(llm, f'{reask_prompt(result.missing, values=MENTION_VALUES)}\n\nReport: "{report}"', result.missing)
+        result = result.merge(parse_labels(retry, findings=result.missing, values=MENTION_VALUES))
+
+    mentioned_findings = mention_stats.record(result, reasked)
+    if mentioned_findings is None:
+        raise ValueError(f"Missing findings after re-ask: {', '.join(result.missing)}")
 
     # Now refine each mentioned finding into "Yes", "No", or "Maybe"
     refined_findings = {}
@@ -100,20 +92,15 @@ Report: "{report}"
         else:
             time.sleep(3.0)
             # If mentioned, ask the second prompt to check presence/absence
-            second_prompt = f"""You are an expert radiologist. Given the following chest X-ray report and the fact that '{finding}' was mentioned (positively or negatively), determine if it is present ("Yes"), explicitly absent ("No"), or indeterminate ("Maybe").
-
-Report: "{report}"
-
-Respond with only one of these three words: "Yes", "No", or "Maybe".
-"""
-            response2 = llm([HumanMessage(second_prompt.strip())])
-            resp_text = response2.content.strip()
-            # If unexpected response, default to "Maybe"
-            if resp_text not in ["Yes", "No", "Maybe"]:
-                print(f"Unexpected response for '{finding}': '{resp_text}'")
-                refined_findings[finding] = "Maybe"
-            else:
-                refined_findings[finding] = resp_text
+            second_prompt = PRESENCE_PROMPT.format(finding=finding, report=report)
+            response2 = llm([HumanMessage(second_prompt)]).content
+            reasked = presence_needs_reask(response2)
+            if reasked:
+                # Re-ask once instead of coercing unexpected text to "Maybe"
+                print(f"Unexpected response for '{finding}': '{response2.strip()}'")
+                time.sleep(3.0)
+                response2 = llm([HumanMessage(second_prompt + PRESENCE_REASK)]).content
+            refined_findings[finding] = record_presence(presence_stats, finding, response2, reasked)
 
     return refined_findings
 
@@ -126,6 +113,9 @@ def main():
     parser.add_argument("--output_path", type=str, required=True, help="Path to the output JSON file.")
     args = parser.parse_args()
 
+    # Initialize the LLM here rather than at import time
+    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+
     # Read the input data (a list of dicts, each with 'patient_id', 'study_id', 'content')
     with open(args.input_path, "r") as f:
         data = json.load(f)
@@ -136,6 +126,8 @@ def main():
 
         # We'll keep a counter to determine if we need a comma before each record.
         record_count = 0
+        mention_stats = ResponseStats()
+        presence_stats = ResponseStats()
 
         for record in tqdm(data, desc="Labeling reports"):
             time.sleep(5.0)
@@ -150,7 +142,7 @@ def main():
 
             # Try to label this record
             try:
-                labels = analyze_report(content)
+                labels = analyze_report(content, llm, mention_stats, presence_stats)
             except Exception as e:
                 print(f"Error labeling record '{study_id}': {e}\nSkipping this report.")
                 continue  # Skip this report entirely
@@ -168,6 +160,8 @@ def main():
 
         out.write("\n]\n")  # Closing bracket for JSON list
 
+    print(f"Mention check - {mention_stats.summary()}")
+    print(f"Presence check - {presence_stats.summary()}")
     print(f"Labeling complete! Results saved to {args.output_path}")
 
 
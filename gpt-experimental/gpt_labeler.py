@@ -1,21 +1,41 @@
 import argparse
 import json
 import asyncio
+import os
+import sys
 import time
 from tqdm import tqdm
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, BadRequestError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.structured_output import ResponseStats, openai_response_format, parse_labels, reask_prompt
 
 aclient = AsyncOpenAI(api_key="")
 
-async def classify_reports_with_chatgpt(reports, prompt_text, output_file, model="gpt-4"):
+async def request_completion(messages, model, response_format):
+    """
+    Call the ChatCompletion API, asking for schema-constrained JSON when `response_format` is given.
+    """
+    kwargs = {"response_format": response_format} if response_format else {}
+    response = await aclient.chat.completions.create(model=model,
+    messages=messages,
+    temperature=1,
+    top_p=0.95,
+    max_tokens=1024,
+    **kwargs)
+    return response.choices[0].message.content or ""
+
+async def classify_reports_with_chatgpt(reports, prompt_text, output_file, model="gpt-4", structured_output=True):
     """
     Classify chest X-ray reports using ChatGPT API.
     :param reports: List of report dictionaries (patient_id, study_id, content, etc.)
     :param prompt_text: Prompt instructions loaded from a text file.
     :param output_file: Path to save JSON output.
     :param model: OpenAI model name (default is 'gpt-4').
+    :param structured_output: Request JSON-schema output; falls back to local repair if the model rejects it.
     """
     labelled_reports = []
+    stats = ResponseStats()
 
     for report in tqdm(reports, desc="Classifying Reports", unit="report"):
         patient_id = report["patient_id"]
@@ -29,28 +49,33 @@ async def classify_reports_with_chatgpt(reports, prompt_text, output_file, model
                 {"role": "user", "content": content},
             ]
 
-            # Call the OpenAI ChatCompletion API asynchronously
-            response = await aclient.chat.completions.create(model=model,
-            messages=messages,
-            temperature=1,
-            top_p=0.95,
-            max_tokens=1024)
-
-            # The response content is in choices[0].message.content
-            raw_response = response.choices[0].message.content.strip("```").strip()
-
-            # Remove any invalid prefix like 'json' and extract JSON object
-            if raw_response.startswith("json"):
-                raw_response = raw_response[len("json"):].strip()
-
-            # Locate the first valid JSON object in the response
-            start_index = raw_response.find("{")
-            end_index = raw_response.rfind("}") + 1
-            if start_index == -1 or end_index == 0:
-                raise ValueError("No JSON object found in the response.")
-
-            cleaned_response = raw_response[start_index:end_index]
-            labels = json.loads(cleaned_response)
+            try:
+                raw_response = await request_completion(
+                    messages, model, openai_response_format() if structured_output else None)
+            except BadRequestError as e:
+                if not structured_output or "response_format" not in str(e):
+                    raise
+                # Older models (e.g. gpt-4) cannot enforce a schema; rely on local repair instead
+                print(f"Model {model} does not support structured output, falling back to local repair.")
+                structured_output = False
+                raw_response = await request_completion(messages, model, None)
+
+            result = parse_labels(raw_response)
+
+            # Ask again only for the findings that could not be recovered
+            reasked = bool(result.missing)
+            if reasked:
+                messages += [
+                    {"role": "assistant", "content": raw_response},
+                    {"role": "user", "content": reask_prompt(result.missing)},
+                ]
+                retry_response = await request_completion(
+                    messages, model, openai_response_format(result.missing) if structured_output else None)
+                result = result.merge(parse_labels(retry_response, findings=result.missing))
+
+            labels = stats.record(result, reasked)
+            if labels is None:
+                raise ValueError(f"Missing labels after re-ask: {', '.join(result.missing)}")
 
             labelled_reports.append({
                 "patient_id": patient_id,
@@ -58,7 +83,7 @@ async def classify_reports_with_chatgpt(reports, prompt_text, output_file, model
                 "labels": labels
             })
 
-        except (ValueError, json.JSONDecodeError) as e:
+        except ValueError as e:
             print(f"JSON decoding error for report {report_name} of patient {patient_id}: {e}")
         except Exception as e:
             print(f"Error processing report {report_name} for patient {patient_id}: {e}")
@@ -67,6 +92,7 @@ async def classify_reports_with_chatgpt(reports, prompt_text, output_file, model
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(labelled_reports, f, ensure_ascii=False, indent=4)
 
+    print(stats.summary())
     return labelled_reports
 
 async def main():
@@ -75,6 +101,7 @@ async def main():
     parser.add_argument('--input_path', type=str, required=True, help="Path to the input JSON file containing the reports.")
     parser.add_argument('--output_path', type=str, required=True, help="Path to the output JSON file where classified reports will be saved.")
     parser.add_argument('--model', type=str, default="gpt-4", help="OpenAI model name (e.g., gpt-3.5-turbo, gpt-4).")
+    parser.add_argument('--no_structured_output', action='store_true', help="Do not request JSON-schema output; only repair responses locally.")
     args = parser.parse_args()
 
     # Read the prompt instructions from text file
@@ -88,7 +115,8 @@ async def main():
     # Configure the ChatGPT API
 
     # Perform classification
-    await classify_reports_with_chatgpt(reports, prompt_text, args.output_path, model=args.model)
+    await classify_reports_with_chatgpt(reports, prompt_text, args.output_path, model=args.model,
+                                        structured_output=not args.no_structured_output)
 
 if __name__ == "__main__":
     asyncio.run(main())
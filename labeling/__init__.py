@@ -0,0 +1,17 @@
+'''
+Unified labeling entry point for all LLM backends.
+
+Run it from the repository root (or with the repository root on PYTHONPATH), e.g.
+python -m labeling --backend gemini --input_path relevant_reports.json --output_path gemini_output.json
+
+Backends are imported only when selected, so `--help` and `--dry_run` do not need any provider SDK.
+'''
+
+import os
+import sys
+
+# The backends share utils/structured_output.py; make the repository root importable
+# however this package was found, like the sys.path bootstrap in the other scripts.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
@@ -0,0 +1,21 @@
+'''
+Backend registry. Each entry points at "module:Class" and is imported only when selected,
+so unused providers never need their SDK installed.
+'''
+
+import importlib
+
+BACKENDS = {
+    "openai": "labeling.backends.openai_backend:OpenAIBackend",
+    "local": "labeling.backends.openai_backend:LocalBackend",
+    "gemini": "labeling.backends.gemini_backend:GeminiBackend",
+    "langchain": "labeling.backends.langchain_backend:LangchainTwoStageBackend",
+}
+
+
+def load_backend(name):
+    """
+    Import and return the backend class registered under `name`.
+    """
+    module_name, class_name = BACKENDS[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
@@ -0,0 +1,65 @@
+import os
+
+from utils.structured_output import FINDINGS, ResponseStats, parse_labels, reask_prompt
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Backend:
+    """
+    Single-stage labeler: system prompt + report in, label JSON out.
+    Subclasses implement `complete`; parsing, local repair and re-asking are shared here.
+    Provider SDKs must only be imported inside methods, never at module level.
+    """
+
+    name = None
+    default_model = None
+    default_prompt = os.path.join(REPO_ROOT, "gpt-experimental", "prompt.txt")
+    api_key_env = None
+
+    def __init__(self, args, scheduler, prompt_text):
+        self.model = args.model or self.default_model
+        self.api_key = args.api_key or (os.environ.get(self.api_key_env) if self.api_key_env else None)
+        self.structured_output = not args.no_structured_output
+        self.scheduler = scheduler
+        self.prompt_text = prompt_text
+        self.stats = ResponseStats()
+
+    def describe(self):
+        return f"backend '{self.name}', model '{self.model}'"
+
+    def summary(self):
+        return self.stats.summary()
+
+    async def complete(self, messages, findings):
+        """
+        Send OpenAI-style `messages` and return the raw response text.
+        `findings` are the keys the structured-output schema should require.
+        """
+        raise NotImplementedError
+
+    async def label(self, content):
+        """
+        Label one report. Returns the labels, raises ValueError if findings are still missing after a re-ask.
+        """
+        messages = [
+            {"role": "system", "content": self.prompt_text},
+            {"role": "user", "content": content},
+        ]
+        raw_response = await self.scheduler.submit(self.complete, messages, FINDINGS)
+        result = parse_labels(raw_response)
+
+        # Ask again only for the findings that could not be recovered
+        reasked = bool(result.missing)
+        if reasked:
+            messages = messages + [
+                {"role": "assistant", "content": raw_response},
+                {"role": "user", "content": reask_prompt(result.missing)},
+            ]
+            retry_response = await self.scheduler.submit(self.complete, messages, result.missing)
+            result = result.merge(parse_labels(retry_response, findings=result.missing))
+
+        labels = self.stats.record(result, reasked)
+        if labels is None:
+            raise ValueError(f"Missing labels after re-ask: {', '.join(result.missing)}")
+        return labels
@@ -0,0 +1,64 @@
+import os
+
+from labeling.backends.base import REPO_ROOT, Backend
+from utils.structured_output import gemini_response_schema
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+
+def _rest_schema(schema):
+    """
+    The REST API expects upper-case OpenAPI type names ("OBJECT", "STRING").
+    """
+    converted = dict(schema)
+    if "type" in converted:
+        converted["type"] = converted["type"].upper()
+    if "properties" in converted:
+        converted["properties"] = {key: _rest_schema(value) for key, value in converted["properties"].items()}
+    return converted
+
+
+class GeminiBackend(Backend):
+    """
+    Gemini `generateContent` REST endpoint. Calling REST directly (instead of google-generativeai)
+    keeps the requests on the scheduler's shared keep-alive pool and needs no SDK.
+    """
+
+    name = "gemini"
+    default_model = "gemini-2.0-flash-exp"
+    default_prompt = os.path.join(REPO_ROOT, "gemini-experimental", "prompt.txt")
+    api_key_env = "GOOGLE_API_KEY"
+
+    def _body(self, messages, findings):
+        generation_config = {
+            "temperature": 1,
+            "topP": 0.95,
+            "topK": 40,
+            "maxOutputTokens": 8192,
+        }
+        if self.structured_output:
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = _rest_schema(gemini_response_schema(findings))
+
+        system = [message["content"] for message in messages if message["role"] == "system"]
+        contents = [
+            {"role": "model" if message["role"] == "assistant" else "user", "parts": [{"text": message["content"]}]}
+            for message in messages if message["role"] != "system"
+        ]
+        body = {"contents": contents, "generationConfig": generation_config}
+        if system:
+            body["systemInstruction"] = {"parts": [{"text": "\n".join(system)}]}
+        return body
+
+    async def complete(self, messages, findings):
+        response = await self.scheduler.http_client.post(
+            GEMINI_API_URL.format(model=self.model),
+            headers={"x-goog-api-key": self.api_key or ""},
+            json=self._body(messages, findings),
+        )
+        response.raise_for_status()
+        candidates = response.json().get("candidates") or []
+        if not candidates:
+            raise ValueError("Gemini returned no candidates (the response may have been blocked).")
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
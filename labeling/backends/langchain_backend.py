@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from labeling.backends.base import Backend
+from labeling.scheduler import is_retryable
+from utils.structured_output import FINDINGS, ResponseStats, gemini_response_schema, parse_labels, reask_prompt
+from utils.two_stage_prompts import (MENTION_PROMPT, MENTION_VALUES, PRESENCE_PROMPT, PRESENCE_REASK,
+                                     presence_needs_reask, record_presence)
+
+
+class LangchainTwoStageBackend(Backend):
+    """
+    Two-stage Gemini labeling through langchain: one mention check per report, then one
+    presence question per mentioned finding. The mention check requests schema-constrained
+    JSON; the stage-two questions run concurrently under the shared scheduler. langchain
+    manages its own transport, so this backend shares the scheduler's limits and retries
+    but not its HTTP pool.
+    """
+
+    name = "langchain"
+    default_model = "gemini-2.0-flash-exp"
+    default_prompt = None
+    api_key_env = "GOOGLE_API_KEY"
+
+    def __init__(self, args, scheduler, prompt_text):
+        super().__init__(args, scheduler, prompt_text)
+        self.presence_stats = ResponseStats()
+        self._llm = None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            self._llm = ChatGoogleGenerativeAI(model=self.model, google_api_key=self.api_key, max_retries=0)
+        return self._llm
+
+    def summary(self):
+        return f"Mention check - {self.stats.summary()}\nPresence check - {self.presence_stats.summary()}"
+
+    async def _ask(self, prompt):
+        response = await self.scheduler.submit(self.llm.ainvoke, prompt)
+        return response.content
+
+    async def _ask_mentions(self, prompt, findings=FINDINGS):
+        """
+        Stage-one request as JSON text. Uses Gemini's structured output unless disabled,
+        falling back to a plain request (repaired locally) if that fails. A non-transient
+        failure switches structured output off for the rest of the run.
+        """
+        if self.structured_output:
+            try:
+                structured_llm = self.llm.with_structured_output(
+                    gemini_response_schema(findings, MENTION_VALUES), method="json_mode")
+                response = await self.scheduler.submit(structured_llm.ainvoke, prompt)
+                if isinstance(response, dict):
+                    return json.dumps(response)
+            except Exception as e:
+                if not is_retryable(e):
+                    print(f"Structured output failed ({e}), falling back to local repair for the rest of the run.")
+                    self.structured_output = False
+        return await self._ask(prompt)
+
+    async def _presence(self, report, finding):
+        prompt = PRESENCE_PROMPT.format(finding=finding, report=report)
+        response = await self._ask(prompt)
+        reasked = presence_needs_reask(response)
+        if reasked:
+            # Re-ask once instead of coercing unexpected text to "Maybe"
+            response = await self._ask(prompt + PRESENCE_REASK)
+        return record_presence(self.presence_stats, finding, response, reasked)
+
+    async def label(self, content):
+        response = await self._ask_mentions(MENTION_PROMPT.format(report=content))
+        result = parse_labels(response, values=MENTION_VALUES)
+
+        # Ask again only for the findings that could not be recovered
+        reasked = bool(result.missing)
+        if reasked:
+            retry = await self._ask_mentions(
+                f'{reask_prompt(result.missing, values=MENTION_VALUES)}\n\nReport: "{content}"', result.missing)
+            result = result.merge(parse_labels(retry, findings=result.missing, values=MENTION_VALUES))
+
+        mentioned_findings = self.stats.record(result, reasked)
+        if mentioned_findings is None:
+            raise ValueError(f"Missing findings after re-ask: {', '.join(result.missing)}")
+
+        mentioned = [finding for finding in FINDINGS if mentioned_findings[finding] == "True"]
+        tasks = [asyncio.ensure_future(self._presence(content, finding)) for finding in mentioned]
+        try:
+            presence = await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the sibling questions instead of letting them use quota for a dropped report
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        refined_findings = {finding: "Undefined" for finding in FINDINGS}
+        refined_findings.update(zip(mentioned, presence))
+        return refined_findings
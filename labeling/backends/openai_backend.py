@@ -0,0 +1,73 @@
+from labeling.backends.base import Backend
+from utils.structured_output import openai_response_format
+
+
+class OpenAIBackend(Backend):
+    """
+    OpenAI ChatCompletion API. The SDK client runs on the scheduler's shared HTTP pool.
+    """
+
+    name = "openai"
+    default_model = "gpt-4o"
+    api_key_env = "OPENAI_API_KEY"
+    default_base_url = None
+
+    def __init__(self, args, scheduler, prompt_text):
+        super().__init__(args, scheduler, prompt_text)
+        self.base_url = args.base_url or self.default_base_url
+        self._client = None
+
+    def describe(self):
+        endpoint = f", endpoint '{self.base_url}'" if self.base_url else ""
+        return super().describe() + endpoint
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            # Retries are handled by the shared scheduler
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                       http_client=self.scheduler.http_client, max_retries=0)
+        return self._client
+
+    async def _request(self, messages, response_format):
+        kwargs = {"response_format": response_format} if response_format else {}
+        response = await self.client.chat.completions.create(model=self.model,
+                                                             messages=messages,
+                                                             temperature=1,
+                                                             top_p=0.95,
+                                                             max_tokens=1024,
+                                                             **kwargs)
+        return response.choices[0].message.content or ""
+
+    async def complete(self, messages, findings):
+        from openai import BadRequestError
+
+        if not self.structured_output:
+            return await self._request(messages, None)
+        try:
+            return await self._request(messages, openai_response_format(findings))
+        except BadRequestError as e:
+            if "response_format" not in str(e):
+                raise
+            # The model cannot enforce a schema; rely on local repair from now on
+            print(f"Model {self.model} does not support structured output, falling back to local repair.")
+            self.structured_output = False
+            return await self._request(messages, None)
+
+
+class LocalBackend(OpenAIBackend):
+    """
+    Any OpenAI-compatible local endpoint (Ollama, LM Studio, vLLM), e.g. for DeepSeek-R1 or Phi-4.
+    """
+
+    name = "local"
+    default_model = "phi4"
+    api_key_env = None
+    default_base_url = "http://localhost:11434/v1"
+
+    def __init__(self, args, scheduler, prompt_text):
+        super().__init__(args, scheduler, prompt_text)
+        # Local servers ignore the key, but the SDK requires one
+        self.api_key = self.api_key or "local"
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+'''
+Startup-time benchmark for the unified labeling CLI.
+
+Use the following command to run it from the repository root:
+python -m labeling.benchmark_startup --runs 5
+
+Runs `--help` and a `--dry_run` for every backend in fresh interpreters and fails
+if the median wall time of any case exceeds the threshold.
+'''
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+from labeling.backends import BACKENDS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure startup time of `python -m labeling`.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per case (default: 5).")
+    parser.add_argument("--threshold", type=float, default=1.0, help="Maximum allowed median seconds per case (default: 1.0).")
+    parser.add_argument("--input_path", default=os.path.join(REPO_ROOT, "data", "relevant_reports.json"),
+                        help="Reports used for the dry runs (default: data/relevant_reports.json).")
+    return parser.parse_args()
+
+
+def time_command(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    args = parse_arguments()
+
+    cases = {"--help": [sys.executable, "-m", "labeling", "--help"]}
+    for backend in sorted(BACKENDS):
+        cases[f"--dry_run ({backend})"] = [
+            sys.executable, "-m", "labeling", "--backend", backend, "--dry_run",
+            "--input_path", args.input_path, "--output_path", os.devnull,
+        ]
+
+    # Interpreter startup alone, for reference
+    baseline = statistics.median(time_command([sys.executable, "-c", "pass"], args.runs))
+    print(f"{'python -c pass':<24} median {baseline:.3f}s")
+
+    slow = []
+    for name, command in cases.items():
+        timings = time_command(command, args.runs)
+        median = statistics.median(timings)
+        print(f"{name:<24} median {median:.3f}s  min {min(timings):.3f}s  max {max(timings):.3f}s")
+        if median > args.threshold:
+            slow.append(name)
+
+    if slow:
+        print(f"Slower than {args.threshold:.2f}s: {', '.join(slow)}")
+        sys.exit(1)
+    print(f"All cases under {args.threshold:.2f}s.")
+
+if __name__ == "__main__":
+    main()
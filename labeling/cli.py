@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+
+from labeling.backends import BACKENDS, load_backend
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m labeling",
+                                     description="Classify chest X-ray reports with a selectable LLM backend.")
+    parser.add_argument("--backend", required=True, choices=sorted(BACKENDS),
+                        help="openai, gemini (REST), langchain (two-stage Gemini) or local (OpenAI-compatible endpoint).")
+    parser.add_argument("--input_path", required=True, help="Path to the input JSON file containing the reports.")
+    parser.add_argument("--output_path", required=True, help="Path to the output JSON file where classified reports will be saved.")
+    parser.add_argument("--prompt_path", help="Path to the .txt prompt for single-stage backends (default: the backend's prompt.txt).")
+    parser.add_argument("--model", help="Model name (default depends on the backend).")
+    parser.add_argument("--base_url", help="API base URL, e.g. for the local backend (default: http://localhost:11434/v1).")
+    parser.add_argument("--api_key", help="API key (default: OPENAI_API_KEY or GOOGLE_API_KEY from the environment).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of requests in flight (default: 4).")
+    parser.add_argument("--min_interval", type=float, default=0.0, help="Minimum seconds between requests, for rate limiting (default: 0).")
+    parser.add_argument("--max_retries", type=int, default=3, help="Retries for rate-limit, server and connection errors (default: 3).")
+    parser.add_argument("--no_structured_output", action="store_true", help="Do not request JSON-schema output; only repair responses locally.")
+    parser.add_argument("--dry_run", action="store_true", help="Validate the inputs and print the plan without calling any API.")
+    args = parser.parse_args(argv)
+
+    if args.concurrency <= 0:
+        parser.error("--concurrency must be greater than 0.")
+    return args
+
+
+async def classify_reports(reports, backend, scheduler, output_file):
+    """
+    Label all reports concurrently, writing partial results (in input order) after each report.
+    """
+    import asyncio
+    from tqdm import tqdm
+
+    labelled_reports = [None] * len(reports)
+
+    def write_results():
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump([record for record in labelled_reports if record is not None], f, ensure_ascii=False, indent=4)
+
+    async def classify_report(index, report, progress):
+        patient_id = report["patient_id"]
+        report_name = report["study_id"]
+        try:
+            labels = await backend.label(report["content"])
+            labelled_reports[index] = {
+                "patient_id": patient_id,
+                "report_name": report_name,
+                "labels": labels
+            }
+            write_results()
+        except Exception as e:
+            print(f"Error processing report {report_name} for patient {patient_id}: {e}")
+        progress.update()
+
+    try:
+        with tqdm(total=len(reports), desc="Classifying Reports", unit="report") as progress:
+            await asyncio.gather(*(classify_report(index, report, progress) for index, report in enumerate(reports)))
+    finally:
+        await scheduler.aclose()
+
+    write_results()
+    return [record for record in labelled_reports if record is not None]
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+
+    # Read the input JSON
+    with open(args.input_path, "r", encoding="utf-8") as f_input:
+        reports = json.load(f_input)
+
+    backend_class = load_backend(args.backend)
+
+    # Read the prompt instructions from text file (the two-stage backend has its prompts built in)
+    prompt_path = args.prompt_path or backend_class.default_prompt
+    prompt_text = None
+    if prompt_path:
+        with open(prompt_path, "r", encoding="utf-8") as f_prompt:
+            prompt_text = f_prompt.read()
+
+    from labeling.scheduler import RequestScheduler
+
+    scheduler = RequestScheduler(concurrency=args.concurrency, min_interval=args.min_interval,
+                                 max_retries=args.max_retries)
+    backend = backend_class(args, scheduler, prompt_text)
+
+    if args.dry_run:
+        prompt = f", prompt '{prompt_path}'" if prompt_path else ""
+        print(f"Dry run: {len(reports)} reports with {backend.describe()}{prompt}, "
+              f"concurrency {args.concurrency}, output '{args.output_path}'.")
+        return
+
+    if backend.api_key_env and not backend.api_key:
+        raise ValueError(f"No API key: pass --api_key or set {backend.api_key_env}.")
+
+    output_dir = os.path.dirname(args.output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    import asyncio
+
+    labelled_reports = asyncio.run(classify_reports(reports, backend, scheduler, args.output_path))
+    print(backend.summary())
+    print(f"Labeling complete! {len(labelled_reports)} of {len(reports)} reports saved to {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
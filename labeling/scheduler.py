@@ -0,0 +1,101 @@
+'''
+Request scheduler shared by every backend: one keep-alive HTTP connection pool,
+a concurrency limit, a minimum interval between requests and retries with backoff.
+'''
+
+import asyncio
+import random
+import time
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc):
+    """
+    True for rate limits, server errors and connection problems
+    (httpx, OpenAI SDK, google.api_core as raised by langchain-google-genai, asyncio timeouts).
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None:
+        # google.api_core exceptions carry the HTTP status in `.code`
+        code = getattr(exc, "code", None)
+        if isinstance(code, int) and not isinstance(code, bool):
+            status = code
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout",
+                                  "ConnectTimeout", "RemoteProtocolError", "ReadError",
+                                  "ResourceExhausted", "ServiceUnavailable", "InternalServerError",
+                                  "DeadlineExceeded")
+
+
+class RequestScheduler:
+    """
+    Runs backend requests under a shared concurrency limit and rate limit.
+    :param concurrency: Maximum number of requests in flight.
+    :param min_interval: Minimum seconds between the start of two requests.
+    :param max_retries: Retries per request for retryable errors (exponential backoff with jitter).
+    :param timeout: HTTP timeout in seconds for the shared client.
+    """
+
+    def __init__(self, concurrency=4, min_interval=0.0, max_retries=3, timeout=60.0):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._semaphore = None
+        self._rate_lock = None
+        self._next_start = 0.0
+        self._http_client = None
+
+    @property
+    def http_client(self):
+        """
+        Shared keep-alive `httpx.AsyncClient`, created (and httpx imported) on first use.
+        """
+        if self._http_client is None:
+            import httpx
+
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency,
+                                    max_keepalive_connections=self.concurrency),
+            )
+        return self._http_client
+
+    async def _wait_for_slot(self):
+        if self.min_interval <= 0:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.min_interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def submit(self, fn, *args, **kwargs):
+        """
+        Await `fn(*args, **kwargs)` once a slot is free, retrying retryable failures.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._rate_lock = asyncio.Lock()
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_slot()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        raise
+                    await asyncio.sleep(min(2 ** attempt, 30) + random.random())
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+'''
+Build a ranked physician review queue from cross-model disagreement.
+
+Use the following command to run this script:
+python disagreement_miner.py --reports relevant_reports.json --ground_truth mimic-cxr-2.1.0-test-set-labeled.csv \
+    --gemini merged.json --gpt gpt_output.json --chexpert comparison_relevant.csv \
+    --deepseek deepseek_r1_distill_local_output.json --phi4 phi4_output.json --output_db review_queue.db
+
+The resulting SQLite file can be queried directly, e.g.
+    SELECT * FROM review_queue WHERE page = 3 ORDER BY rank;
+    SELECT * FROM finding_disagreements WHERE finding = 'Atelectasis' ORDER BY score DESC LIMIT 20;
+'''
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.structured_output import FINDINGS, LABEL_VALUES
+
+MODEL_SOURCES = ["gemini", "gpt", "chexpert", "deepseek", "phi4"]
+
+# CheXpert-style CSV encoding (ground truth and CheXpert labeler output)
+_CSV_VALUES = {1: "Yes", 0: "No", -1: "Maybe"}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Rank studies for physician review by cross-model disagreement.")
+    parser.add_argument("--reports", required=True, help="Path to relevant_reports.json (report content per study).")
+    parser.add_argument("--ground_truth", help="Path to the physician-labeled CSV (study_id + finding columns).")
+    parser.add_argument("--gemini", help="Path to the Gemini labeler output JSON.")
+    parser.add_argument("--gpt", help="Path to the GPT labeler output JSON.")
+    parser.add_argument("--chexpert", help="Path to the CheXpert labeler output CSV.")
+    parser.add_argument("--deepseek", help="Path to the DeepSeek-R1 output JSON.")
+    parser.add_argument("--phi4", help="Path to the Phi-4 output JSON.")
+    parser.add_argument("--output_db", required=True, help="Path for the output SQLite file.")
+    parser.add_argument("--page_size", type=int, default=25, help="Number of studies per review page (default: 25).")
+    parser.add_argument("--undefined_as_no", action=argparse.BooleanOptionalAction, default=True,
+                        help="Score 'Undefined' / empty labels as 'No', as the evaluation notebooks do (default: on).")
+    return parser.parse_args()
+
+
+def _study_id_to_int(study_ids):
+    return study_ids.astype(str).str.replace("s", "").str.replace(".txt", "").astype(int)
+
+
+def load_labeler_output(path):
+    """
+    Load a labeler output JSON (patient_id, report_name, labels) into a study_id x finding frame of label strings.
+    """
+    results_df = pd.read_json(path)
+    labels_df = pd.json_normalize(results_df["labels"])
+    labels_df.index = _study_id_to_int(results_df["report_name"])
+    labels_df = labels_df[~labels_df.index.duplicated(keep="last")]
+    return labels_df.reindex(columns=FINDINGS)
+
+
+def load_label_csv(path):
+    """
+    Load a CheXpert-style CSV (1 / 0 / -1 / empty) into a study_id x finding frame of label strings.
+    """
+    csv_df = pd.read_csv(path)
+    csv_df = csv_df.rename(columns={"Airspace Opacity": "Lung Opacity"})
+    csv_df = csv_df.drop_duplicates(subset=["study_id"], keep="last").set_index("study_id")
+    csv_df.index = _study_id_to_int(csv_df.index.to_series())
+    labels_df = csv_df.reindex(columns=FINDINGS)
+    return labels_df.apply(lambda col: col.map(_CSV_VALUES)).fillna("Undefined")
+
+
+def encode_labels(labels_df, study_ids, undefined_as_no=True):
+    """
+    Encode label strings as int8 codes (index into LABEL_VALUES); -1 marks a study/finding the source did not label.
+    With `undefined_as_no`, "Undefined" is encoded as "No" so "not mentioned" does not count as a disagreement.
+    """
+    aligned = labels_df.reindex(index=study_ids, columns=FINDINGS).to_numpy()
+    codes = np.full(aligned.shape, -1, dtype=np.int8)
+    for code, value in enumerate(LABEL_VALUES):
+        codes[aligned == value] = code
+    if undefined_as_no:
+        codes[codes == LABEL_VALUES.index("Undefined")] = LABEL_VALUES.index("No")
+    return codes
+
+
+def _raw_labels(labels_df, study_ids):
+    aligned = labels_df.reindex(index=study_ids, columns=FINDINGS).to_numpy(dtype=object).ravel()
+    return np.where(pd.isna(aligned), None, aligned)
+
+
+def score_disagreement(model_codes, truth_codes=None):
+    """
+    Vectorized per-study, per-finding disagreement scores.
+    :param model_codes: int8 array (sources x studies x findings) from `encode_labels`.
+    :param truth_codes: optional int8 array (studies x findings) for the ground truth.
+    :return: (score, model_disagreement, truth_disagreement) arrays of shape (studies x findings).
+    - model_disagreement: share of available models that do not give the most common label.
+    - truth_disagreement: share of available models whose label differs from the ground truth.
+    """
+    available = model_codes >= 0
+    n_available = available.sum(axis=0)
+    counts = (model_codes[..., None] == np.arange(len(LABEL_VALUES), dtype=np.int8)).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        model_disagreement = np.where(n_available > 0, 1.0 - counts.max(axis=-1) / n_available, 0.0)
+
+        truth_disagreement = np.zeros(model_disagreement.shape)
+        if truth_codes is not None:
+            mismatches = (available & (model_codes != truth_codes[None, ...])).sum(axis=0)
+            has_truth = (truth_codes >= 0) & (n_available > 0)
+            truth_disagreement = np.where(has_truth, mismatches / n_available, 0.0)
+
+    return model_disagreement + truth_disagreement, model_disagreement, truth_disagreement
+
+
+def build_review_queue(sources, truth_df, reports, page_size, undefined_as_no=True):
+    """
+    Rank studies by total disagreement.
+    :param sources: dict of source name -> label frame (from `load_labeler_output` / `load_label_csv`).
+    :param truth_df: ground truth label frame, or None.
+    :param reports: list of report dictionaries from relevant_reports.json.
+    :param undefined_as_no: Score "Undefined" / empty labels as "No" (the raw labels are still stored).
+    :return: (review_queue, finding_disagreements) DataFrames ready for SQLite.
+    """
+    reports_df = pd.DataFrame(reports)
+    reports_df.index = _study_id_to_int(reports_df["study_id"])
+    reports_df = reports_df[~reports_df.index.duplicated(keep="last")]
+
+    study_ids = reports_df.index
+    if truth_df is not None:
+        study_ids = study_ids.intersection(truth_df.index)
+    study_ids = study_ids.sort_values()
+
+    model_codes = np.stack([encode_labels(labels_df, study_ids, undefined_as_no) for labels_df in sources.values()])
+    truth_codes = encode_labels(truth_df, study_ids, undefined_as_no) if truth_df is not None else None
+    score, model_disagreement, truth_disagreement = score_disagreement(model_codes, truth_codes)
+
+    # Long table: one row per (study, finding) with every source's label
+    finding_disagreements = pd.DataFrame({
+        "study_id": np.repeat(reports_df.loc[study_ids, "study_id"].to_numpy(), len(FINDINGS)),
+        "finding": np.tile(FINDINGS, len(study_ids)),
+        "score": score.ravel(),
+        "model_disagreement": model_disagreement.ravel(),
+        "truth_disagreement": truth_disagreement.ravel(),
+    })
+    # Raw label strings for display, independent of how they were scored
+    for name, labels_df in sources.items():
+        finding_disagreements[name] = _raw_labels(labels_df, study_ids)
+    if truth_df is not None:
+        finding_disagreements["ground_truth"] = _raw_labels(truth_df, study_ids)
+
+    review_queue = pd.DataFrame({
+        "study_id": reports_df.loc[study_ids, "study_id"].to_numpy(),
+        "patient_id": reports_df.loc[study_ids, "patient_id"].to_numpy(),
+        "score": score.sum(axis=1),
+        "disputed_findings": (score > 0).sum(axis=1),
+        "content": reports_df.loc[study_ids, "content"].to_numpy(),
+    })
+    review_queue = review_queue.sort_values(["score", "study_id"], ascending=[False, True], kind="stable")
+    review_queue.insert(0, "rank", np.arange(1, len(review_queue) + 1))
+    review_queue.insert(1, "page", (review_queue["rank"] - 1) // page_size + 1)
+    return review_queue, finding_disagreements
+
+
+def write_sqlite(review_queue, finding_disagreements, output_db):
+    """
+    Write both tables plus the indexes used by the review UI queries.
+    """
+    if os.path.exists(output_db):
+        os.remove(output_db)
+    with sqlite3.connect(output_db) as conn:
+        review_queue.to_sql("review_queue", conn, index=False)
+        finding_disagreements.to_sql("finding_disagreements", conn, index=False)
+        conn.executescript("""
+            CREATE UNIQUE INDEX idx_review_queue_rank ON review_queue (rank);
+            CREATE INDEX idx_review_queue_page ON review_queue (page, rank);
+            CREATE UNIQUE INDEX idx_review_queue_study ON review_queue (study_id);
+            CREATE INDEX idx_finding_disagreements_study ON finding_disagreements (study_id, finding);
+            CREATE INDEX idx_finding_disagreements_score ON finding_disagreements (finding, score DESC);
+        """)
+
+
+def fetch_page(output_db, page):
+    """
+    Return one page of the review queue with every source's label per finding.
+    """
+    with sqlite3.connect(output_db) as conn:
+        conn.row_factory = sqlite3.Row
+        studies = [dict(row) for row in conn.execute(
+            "SELECT * FROM review_queue WHERE page = ? ORDER BY rank", (page,))]
+        for study in studies:
+            study["findings"] = [dict(row) for row in conn.execute(
+                "SELECT * FROM finding_disagreements WHERE study_id = ? ORDER BY score DESC, finding",
+                (study["study_id"],))]
+    return studies
+
+
+def main():
+    args = parse_arguments()
+
+    if args.page_size <= 0:
+        raise ValueError("Page size must be greater than 0.")
+
+    sources = {}
+    for name in MODEL_SOURCES:
+        path = getattr(args, name)
+        if path:
+            sources[name] = load_label_csv(path) if path.lower().endswith(".csv") else load_labeler_output(path)
+    if not sources:
+        raise ValueError("At least one model output (--gemini, --gpt, --chexpert, --deepseek, --phi4) is required.")
+
+    truth_df = load_label_csv(args.ground_truth) if args.ground_truth else None
+
+    with open(args.reports, "r", encoding="utf-8") as f:
+        reports = json.load(f)
+
+    review_queue, finding_disagreements = build_review_queue(sources, truth_df, reports, args.page_size,
+                                                             undefined_as_no=args.undefined_as_no)
+    write_sqlite(review_queue, finding_disagreements, args.output_db)
+
+    disputed = int((review_queue["score"] > 0).sum())
+    print(f"Review queue with {len(review_queue)} studies ({disputed} with disagreement, "
+          f"{review_queue['page'].max() if len(review_queue) else 0} pages) saved to {args.output_db}.")
+
+if __name__ == "__main__":
+    main()
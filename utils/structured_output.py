@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+'''
+Shared response layer for the LLM labelers.
+
+Builds the JSON schemas used to request structured output from the providers
+and parses / repairs the raw model text when the provider could not enforce
+the schema. Only the standard library is used, so every labeler can import it.
+'''
+
+import json
+import re
+
+# The 13 findings every labeler must return
+FINDINGS = [
+    "Atelectasis",
+    "Cardiomegaly",
+    "Consolidation",
+    "Edema",
+    "Enlarged Cardiomediastinum",
+    "Fracture",
+    "Lung Lesion",
+    "Lung Opacity",
+    "Pleural Effusion",
+    "Pleural Other",
+    "Pneumonia",
+    "Pneumothorax",
+    "Support Devices",
+]
+
+LABEL_VALUES = ["Yes", "No", "Maybe", "Undefined"]
+
+# Alternative spellings seen in model outputs and in the ground truth CSV
+_FINDING_ALIASES = {
+    "airspace opacity": "Lung Opacity",
+    "enlarged cardiomediastinal silhouette": "Enlarged Cardiomediastinum",
+    "support device": "Support Devices",
+    "pleural effusions": "Pleural Effusion",
+}
+
+_VALUE_ALIASES = {
+    "present": "Yes",
+    "positive": "Yes",
+    "absent": "No",
+    "negative": "No",
+    "uncertain": "Maybe",
+    "possible": "Maybe",
+    "indeterminate": "Maybe",
+    "not mentioned": "Undefined",
+    "unknown": "Undefined",
+    "n/a": "Undefined",
+}
+
+
+def labels_json_schema(findings=FINDINGS, values=LABEL_VALUES):
+    """
+    JSON schema of a label object: one required enum-valued key per finding.
+    """
+    return {
+        "type": "object",
+        "properties": {finding: {"type": "string", "enum": list(values)} for finding in findings},
+        "required": list(findings),
+        "additionalProperties": False,
+    }
+
+
+def openai_response_format(findings=FINDINGS, values=LABEL_VALUES):
+    """
+    `response_format` argument for OpenAI-compatible chat completion endpoints.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "chest_xray_labels",
+            "strict": True,
+            "schema": labels_json_schema(findings, values),
+        },
+    }
+
+
+def gemini_response_schema(findings=FINDINGS, values=LABEL_VALUES):
+    """
+    `response_schema` for Gemini. Gemini accepts an OpenAPI subset without `additionalProperties`.
+    """
+    schema = labels_json_schema(findings, values)
+    del schema["additionalProperties"]
+    return schema
+
+
+def reask_prompt(missing, values=LABEL_VALUES):
+    """
+    Follow-up prompt asking the model only for the findings that could not be recovered.
+    """
+    keys = ",\n".join(f'  "{finding}": "..."' for finding in missing)
+    allowed = ", ".join(f'"{value}"' for value in values)
+    return (
+        "Your previous answer could not be read for some findings. "
+        f"Respond with only a JSON object containing exactly these keys, each set to one of {allowed}:\n"
+        "{\n" + keys + "\n}"
+    )
+
+
+class ParseResult:
+    """
+    Outcome of parsing one model response.
+    - labels: recovered finding -> value pairs (only valid values).
+    - missing: requested findings that could not be recovered.
+    - repaired: True if anything beyond a plain `json.loads` was needed.
+    """
+
+    def __init__(self, labels, missing, repaired):
+        self.labels = labels
+        self.missing = missing
+        self.repaired = repaired
+
+    def merge(self, other):
+        """
+        Combine with the result of a re-ask for the missing findings.
+        """
+        labels = dict(self.labels)
+        labels.update(other.labels)
+        missing = [finding for finding in self.missing if finding not in labels]
+        return ParseResult(labels, missing, self.repaired or other.repaired)
+
+
+class ResponseStats:
+    """
+    Counters for how responses were resolved over a labeling run.
+    """
+
+    def __init__(self):
+        self.clean = 0
+        self.repaired = 0
+        self.reasked = 0
+        self.dropped = 0
+
+    def record(self, result, reasked=False):
+        """
+        Count a final parse result. Returns the labels, or None if the record has to be dropped.
+        """
+        if reasked:
+            self.reasked += 1
+        if result.missing:
+            self.dropped += 1
+            return None
+        if result.repaired:
+            self.repaired += 1
+        elif not reasked:
+            self.clean += 1
+        return result.labels
+
+    def summary(self):
+        return (f"Responses: {self.clean} clean, {self.repaired} repaired, "
+                f"{self.reasked} re-asked, {self.dropped} dropped.")
+
+
+def _normalize_key(key):
+    return re.sub(r"[\s_\-]+", " ", str(key)).strip().lower()
+
+
+def _canonical_finding(key, findings):
+    normalized = _normalize_key(key)
+    for finding in findings:
+        if _normalize_key(finding) == normalized:
+            return finding
+    alias = _FINDING_ALIASES.get(normalized)
+    if alias in findings:
+        return alias
+    return None
+
+
+def normalize_value(value, values=LABEL_VALUES):
+    """
+    Map a raw label value onto one of `values` (case/punctuation tolerant). Returns None if it cannot.
+    """
+    if value is None:
+        return "Undefined" if "Undefined" in values else None
+    if isinstance(value, bool):
+        value = str(value)
+    text = str(value).strip().strip("\"'`*.,;:!").strip().lower()
+    for candidate in values:
+        if candidate.lower() == text:
+            return candidate
+    alias = _VALUE_ALIASES.get(text)
+    if alias in values:
+        return alias
+    return None
+
+
+def _strip_fences(text):
+    text = text.strip()
+    fenced = re.search(r"```(?:json|JSON)?\s*(.*?)```", text, flags=re.DOTALL)
+    if fenced:
+        return fenced.group(1).strip()
+    text = text.strip("`").strip()
+    if text.lower().startswith("json"):
+        text = text[len("json"):].strip()
+    return text
+
+
+def _repair_json(text):
+    """
+    Fix the usual LLM JSON mistakes: smart/single quotes, trailing commas, a missing closing brace.
+    """
+    text = text.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    text = re.sub(r"'([^'\n]*)'", r'"\1"', text)
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+    if text.count("{") > text.count("}"):
+        text = text.rstrip().rstrip(",") + "}" * (text.count("{") - text.count("}"))
+    return text
+
+
+def _load_object(text):
+    """
+    Returns (dict or None, repaired).
+    """
+    start_index = text.find("{")
+    if start_index == -1:
+        return None, True
+    end_index = text.rfind("}") + 1
+    candidate = text[start_index:end_index] if end_index > start_index else text[start_index:]
+    try:
+        data = json.loads(candidate)
+        if isinstance(data, dict):
+            return data, False
+    except json.JSONDecodeError:
+        pass
+    try:
+        data = json.loads(_repair_json(text[start_index:]))
+        if isinstance(data, dict):
+            return data, True
+    except json.JSONDecodeError:
+        pass
+    return None, True
+
+
+def _scan_pairs(text, findings):
+    """
+    Last resort: pick `"Finding": value` pairs out of free text line by line.
+    """
+    pairs = {}
+    for finding in findings:
+        # Key, separator, then the value up to trailing punctuation / quote / delimiter
+        pattern = (r"[\"']?" + re.escape(finding).replace(r"\ ", r"[\s_\-]+")
+                   + r"[\"']?\s*[:=\-]\s*[\"']?([A-Za-z/ ]+?)[.!;]*[\"']?[.!;]*\s*(?:[,}\n]|$)")
+        match = re.search(pattern, text, flags=re.IGNORECASE)
+        if match:
+            pairs[finding] = match.group(1)
+    return pairs
+
+
+def parse_labels(text, findings=FINDINGS, values=LABEL_VALUES):
+    """
+    Tolerant parser for a label object in raw model text.
+    Strips code fences, repairs malformed JSON and falls back to scanning key/value pairs,
+    so a single stray character no longer costs the whole report.
+    """
+    text = _strip_fences(text or "")
+    data, repaired = _load_object(text)
+    if data is not None and not any(_canonical_finding(key, findings) for key in data):
+        # Labels wrapped in one outer object, e.g. {"labels": {...}}
+        nested = [value for value in data.values() if isinstance(value, dict)]
+        data = nested[0] if len(nested) == 1 else None
+        repaired = True
+    if data is None:
+        data = _scan_pairs(text, findings)
+
+    labels = {}
+    for key, value in data.items():
+        finding = _canonical_finding(key, findings)
+        label = normalize_value(value, values)
+        if finding is None or label is None:
+            repaired = True
+            continue
+        if finding != key or label != value:
+            repaired = True
+        labels[finding] = label
+
+    missing = [finding for finding in findings if finding not in labels]
+    return ParseResult(labels, missing, repaired)
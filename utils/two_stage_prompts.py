@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+'''
+Prompts and stage-two answer handling for the two-stage labeling pipeline
+(mention check, then presence check), shared by gemini-experimental/gemini_labeler_pipelined.py
+and the langchain backend. Fill the prompts in with `str.format(report=..., finding=...)`.
+'''
+
+from utils.structured_output import ParseResult, normalize_value
+
+MENTION_VALUES = ["True", "False"]
+
+PRESENCE_VALUES = ["Yes", "No", "Maybe"]
+
+# Stage 1: is each finding mentioned at all
+MENTION_PROMPT = """Your task is to analyze a chest X-ray report and determine whether each of the following 14 findings is mentioned in the report. A finding is considered “mentioned” if the report explicitly states its presence, absence, or any related term (including synonyms or negative statements such as “no evidence of _____”). For example, a statement like “no pneumothorax” means that “Pneumothorax” is mentioned, so you must return "True" for that key.
+
+When you receive the chest X-ray report, respond only with a single JSON object. That JSON object must contain exactly the 14 keys listed below. Each key must have either the string "True" or "False" as its value:
+
+{{
+"Atelectasis": "...",
+"Cardiomegaly": "...",
+"Consolidation": "...",
+"Edema": "...",
+"Enlarged Cardiomediastinum": "...",
+"Fracture": "...",
+"Lung Lesion": "...",
+"Lung Opacity": "...",
+"Pleural Effusion": "...",
+"Pleural Other": "...",
+"Pneumonia": "...",
+"Pneumothorax": "...",
+"Support Devices": "..."
+}}
+
+Where each ... is replaced by "True" if the finding is mentioned (positively or negatively) or "False" if it is not mentioned at all in the report.
+
+Report: "{report}"
+"""
+
+# Stage 2: for a mentioned finding, is it present, absent or indeterminate
+PRESENCE_PROMPT = """You are an expert radiologist. Given the following chest X-ray report and the fact that '{finding}' was mentioned (positively or negatively), determine if it is present ("Yes"), explicitly absent ("No"), or indeterminate ("Maybe").
+
+Report: "{report}"
+
+Respond with only one of these three words: "Yes", "No", or "Maybe"."""
+
+
+# Appended to PRESENCE_PROMPT when the first answer was not one of PRESENCE_VALUES
+PRESENCE_REASK = "\nYour previous answer was not one of these words. Answer with exactly one word."
+
+
+def presence_needs_reask(response):
+    """
+    True if a stage-two answer is not one of PRESENCE_VALUES and should be asked again with PRESENCE_REASK.
+    """
+    return normalize_value(response, PRESENCE_VALUES) is None
+
+
+def record_presence(stats, finding, response, reasked):
+    """
+    Count the final stage-two answer for `finding` in `stats` and return its label.
+    Raises ValueError if it is still not one of PRESENCE_VALUES (instead of coercing it to "Maybe").
+    """
+    label = normalize_value(response, PRESENCE_VALUES)
+    stats.record(ParseResult({finding: label} if label else {}, [] if label else [finding], False), reasked)
+    if label is None:
+        raise ValueError(f"No valid label for '{finding}' after re-ask: '{response.strip()}'")
+    return label